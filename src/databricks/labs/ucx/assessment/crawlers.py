@@ -10,6 +10,7 @@ from databricks.sdk.service.compute import ClusterSource, Policy
 from databricks.sdk.service.jobs import BaseJob
 
 from databricks.labs.ucx.framework.crawlers import CrawlerBase, SqlBackend
+from databricks.labs.ucx.framework.parallel import ManyError, Threads
 
 logger = logging.getLogger(__name__)
 
@@ -289,18 +290,21 @@ class AzureServicePrincipalCrawler(CrawlerBase):
                     yield j, t.new_cluster
 
     def _get_relevant_service_principals(self) -> list:
+        # these listings are independent REST calls, so they can overlap instead of running back to back
+        tasks = [
+            self._list_all_cluster_with_spn_in_spark_conf,
+            self._list_all_pipeline_with_spn_in_spark_conf,
+            self._list_all_jobs_with_spn_in_spark_conf,
+            self._list_all_spn_in_sql_warehouses_spark_conf,
+        ]
+        results, errors = Threads.gather("listing azure service principals", tasks)
+        if len(errors) == 1:
+            # keep the SDK error type for callers when only one listing failed
+            raise errors[0]
+        if errors:
+            raise ManyError(errors)
         relevant_service_principals = []
-        temp_list = self._list_all_cluster_with_spn_in_spark_conf()
-        if temp_list:
-            relevant_service_principals += temp_list
-        temp_list = self._list_all_pipeline_with_spn_in_spark_conf()
-        if temp_list:
-            relevant_service_principals += temp_list
-        temp_list = self._list_all_jobs_with_spn_in_spark_conf()
-        if temp_list:
-            relevant_service_principals += temp_list
-        temp_list = self._list_all_spn_in_sql_warehouses_spark_conf()
-        if temp_list:
+        for temp_list in results:
             relevant_service_principals += temp_list
         return relevant_service_principals
 
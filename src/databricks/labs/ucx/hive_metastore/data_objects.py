@@ -1,108 +1,161 @@
 import logging
 import os
-import re
-import typing
+from collections.abc import Iterable
 from dataclasses import dataclass
 
 from databricks.sdk import WorkspaceClient
 
 from databricks.labs.ucx.framework.crawlers import CrawlerBase, SqlBackend
-from databricks.labs.ucx.hive_metastore.mounts import Mounts
+from databricks.labs.ucx.hive_metastore.mounts import Mount, Mounts
 from databricks.labs.ucx.mixins.sql import Row
 
-logger = logging.getLogger(__name__)
+try:
+    # RE2 guarantees linear-time matching on untrusted storage_properties
+    import re2 as _re
+except ImportError:
+    import re as _re
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+# RE2 has no lookahead, so the delimiter after the value is consumed instead of peeked at
+_JDBC_PROP_RE = _re.compile(r"(\w+)=([^,\]\n]*?)\s*[,\]]")
+# currently supporting databricks and mysql external tables
+# add other jdbc types
+_JDBC_LOCATION_TEMPLATES = {
+    "databricks": "jdbc:databricks://{host};httpPath={httppath}",
+    "mysql": "jdbc:mysql://{host}:{port}/{database}",
+}
+# any "scheme:/" location counts as external storage: s3, abfss, gs, hdfs, r2, ...
+_SCHEME_SEPARATOR_BOUNDS = (1, 12)
+
+
+def _common_dir(a: str, b: str) -> str:
+    """Returns the longest common prefix of two locations, truncated after the last shared slash."""
+    if a.find("//", a.find(":/") + 3) != -1 or b.find("//", b.find(":/") + 3) != -1:
+        # commonpath compares whole path segments and collapses empty ones, e.g. s3://b/db//t
+        return os.path.commonpath([a, b]).replace(":/", "://") + "/"
+    if a.endswith("/") and b.startswith(a):
+        # in sorted order nested directories follow their parent, so this skips the character walk
+        return a
+    n = min(len(a), len(b))
+    i = 0
+    last = 0
+    while i < n and a[i] == b[i]:
+        if a[i] == "/":
+            last = i + 1
+        i += 1
+    return a[:last]
+
+
+def _classify(location: str) -> str:
+    """Tells DBFS paths, JDBC connections and storage URLs apart, once mount points are resolved."""
+    if location.startswith("dbfs"):
+        return "dbfs"
+    if location.startswith("jdbc"):
+        return "jdbc"
+    if _SCHEME_SEPARATOR_BOUNDS[0] < location.find(":/") < _SCHEME_SEPARATOR_BOUNDS[1]:
+        return "url"
+    return "other"
+
+
+@dataclass(frozen=True)
 class ExternalLocation:
     location: str
 
 
 class ExternalLocationCrawler(CrawlerBase):
-    _prefix_size: typing.ClassVar[list[int]] = [1, 12]
-
     def __init__(self, ws: WorkspaceClient, sbe: SqlBackend, schema):
         super().__init__(sbe, "hive_metastore", schema, "external_locations", ExternalLocation)
         self._ws = ws
 
-    def _external_locations(self, tables: list[Row], mounts) -> list[ExternalLocation]:
+    def _external_locations(self, tables: Iterable[Row], mounts: Iterable[Mount]) -> list[ExternalLocation]:
         min_slash = 2
-        external_locations: list[ExternalLocation] = []
+        candidates: list[str] = []
+        jdbc_locations: list[str] = []
+        jdbc_seen: set[str] = set()
+        # longest mount point first, so that nested mounts win over their parents
+        mounts_sorted = sorted(((m.name, m.source) for m in mounts), key=lambda x: -len(x[0]))
+        # many tables share a storage location, so each distinct one is normalized only once
+        seen: set[str] = set()
         for table in tables:
             location = table.location
             if location is not None and len(location) > 0:
+                if location in seen:
+                    continue
                 if location.startswith("dbfs:/mnt"):
-                    for mount in mounts:
-                        if location[5:].startswith(mount.name):
-                            location = location[5:].replace(mount.name, mount.source)
+                    tail = location[5:]
+                    for name, source in mounts_sorted:
+                        if tail.startswith(name):
+                            location = source + tail[len(name) :]
                             break
-                if (
-                    not location.startswith("dbfs")
-                    and (self._prefix_size[0] < location.find(":/") < self._prefix_size[1])
-                    and not location.startswith("jdbc")
-                ):
-                    dupe = False
-                    loc = 0
-                    while loc < len(external_locations) and not dupe:
-                        common = (
-                            os.path.commonpath(
-                                [external_locations[loc].location, os.path.dirname(location) + "/"]
-                            ).replace(":/", "://")
-                            + "/"
-                        )
-                        if common.count("/") > min_slash:
-                            external_locations[loc] = ExternalLocation(common)
-                            dupe = True
-                        loc += 1
-                    if not dupe:
-                        external_locations.append(ExternalLocation(os.path.dirname(location) + "/"))
-                if location.startswith("jdbc"):
-                    pattern = r"(\w+)=(.*?)(?=\s*,|\s*\])"
-
+                kind = _classify(location)
+                if kind == "url":
+                    seen.add(table.location)
+                    # parent directory with a single trailing slash, like os.path.dirname(location) + "/"
+                    candidates.append(location[: location.rfind("/")].rstrip("/") + "/")
+                elif kind == "jdbc":
                     # Find all matches in the input string
                     # Storage properties is of the format
                     # "[personalAccessToken=*********(redacted), \
                     #  httpPath=/sql/1.0/warehouses/65b52fb5bd86a7be, host=dbc-test1-aa11.cloud.databricks.com, \
                     #  dbtable=samples.nyctaxi.trips]"
-                    matches = re.findall(pattern, table.storage_properties)
-
-                    # Create a dictionary from the matches
-                    result_dict = dict(matches)
-
-                    # Fetch the value of host from the newly created dict
-                    host = result_dict.get("host", "")
-                    port = result_dict.get("port", "")
-                    database = result_dict.get("database", "")
-                    httppath = result_dict.get("httpPath", "")
-                    provider = result_dict.get("provider", "")
-                    # dbtable = result_dict.get("dbtable", "")
-
-                    # currently supporting databricks and mysql external tables
-                    # add other jdbc types
-                    if "databricks" in location.lower():
-                        jdbc_location = f"jdbc:databricks://{host};httpPath={httppath}"
-                    elif "mysql" in location.lower():
-                        jdbc_location = f"jdbc:mysql://{host}:{port}/{database}"
-                    elif not provider == "":
-                        jdbc_location = f"jdbc:{provider.lower()}://{host}:{port}/{database}"
+                    host = port = database = httppath = provider = ""
+                    for m in _JDBC_PROP_RE.finditer(table.storage_properties or ""):
+                        key, value = m.group(1), m.group(2)
+                        if key == "host":
+                            host = value
+                        elif key == "port":
+                            port = value
+                        elif key == "database":
+                            database = value
+                        elif key == "httpPath":
+                            httppath = value
+                        elif key == "provider":
+                            provider = value
+
+                    location_lower = location.lower()
+                    for jdbc_type, template in _JDBC_LOCATION_TEMPLATES.items():
+                        if jdbc_type in location_lower:
+                            jdbc_location = template.format(host=host, port=port, database=database, httppath=httppath)
+                            break
                     else:
-                        jdbc_location = f"{location.lower()}/{host}:{port}/{database}"
-                    external_locations.append(ExternalLocation(jdbc_location))
-
-        return external_locations
+                        if not provider == "":
+                            jdbc_location = f"jdbc:{provider.lower()}://{host}:{port}/{database}"
+                        else:
+                            jdbc_location = f"{location_lower}/{host}:{port}/{database}"
+                    if jdbc_location not in jdbc_seen:
+                        jdbc_seen.add(jdbc_location)
+                        jdbc_locations.append(jdbc_location)
+                elif kind == "other":
+                    seen.add(table.location)
+                    logger.warning(f"Skipping table location without a storage scheme: {location}")
+
+        # after sorting, locations sharing a bucket or container are adjacent,
+        # so a single sweep merges each group into its longest common directory
+        merged: list[str] = []
+        current = None
+        for candidate in sorted(candidates):
+            if current is not None:
+                common = _common_dir(current, candidate)
+                if common.count("/") > min_slash:
+                    current = common
+                    continue
+                merged.append(current)
+            current = candidate
+        if current is not None:
+            merged.append(current)
+        return [ExternalLocation(location) for location in merged + jdbc_locations]
 
     def _external_location_list(self):
-        tables = list(
-            self._backend.fetch(
-                f"SELECT location, storage_properties FROM {self._schema}.tables WHERE location IS NOT NULL"
-            )
+        tables = self._backend.fetch(
+            f"SELECT location, storage_properties FROM {self._schema}.tables WHERE location IS NOT NULL"
         )
         mounts = Mounts(self._backend, self._ws, self._schema).snapshot()
-        return self._external_locations(list(tables), list(mounts))
+        return self._external_locations(tables, mounts)
 
     def snapshot(self) -> list[ExternalLocation]:
         return self._snapshot(self._try_fetch, self._external_location_list)
 
     def _try_fetch(self) -> list[ExternalLocation]:
-        for row in self._fetch(f"SELECT * FROM {self._schema}.{self._table}"):
-            yield ExternalLocation(*row)
+        for (location,) in self._fetch(f"SELECT location FROM {self._schema}.{self._table}"):
+            yield ExternalLocation(location)
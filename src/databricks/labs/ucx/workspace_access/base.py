@@ -9,7 +9,7 @@ logger = Logger(__name__)
 
 
 # TODO: fix order to standard https://github.com/databrickslabs/ucx/issues/411
-@dataclass
+@dataclass(frozen=True)
 class Permissions:
     object_id: str
     object_type: str
@@ -38,6 +38,7 @@ from databricks.labs.ucx.assessment.crawlers import (
     PipelinesCrawler,
     spark_version_compatibility,
 )
+from databricks.labs.ucx.framework.parallel import ManyError
 from databricks.labs.ucx.hive_metastore.data_objects import ExternalLocationCrawler
 from databricks.labs.ucx.hive_metastore.mounts import Mount
 from databricks.labs.ucx.mixins.sql import Row
@@ -119,6 +120,120 @@ def test_external_locations():
     assert result_set[6].location == "jdbc:providerunknown://somedb.us-east-1.rds.amazonaws.com:1234/test_db"
 
 
+def test_external_locations_nested_mounts():
+    crawler = ExternalLocationCrawler(Mock(), MockBackend(), "test")
+    row_factory = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    sample_locations = [
+        row_factory(["dbfs:/mnt/ucx/database1/table1", ""]),
+        row_factory(["dbfs:/mnt/ucx/nested/database2/table2", ""]),
+    ]
+    sample_mounts = [
+        Mount("/mnt/ucx", "s3://us-east-1-ucx-container"),
+        Mount("/mnt/ucx/nested", "gs://ucx-nested-bucket"),
+    ]
+    result_set = crawler._external_locations(sample_locations, sample_mounts)
+    assert [r.location for r in result_set] == [
+        "gs://ucx-nested-bucket/database2/",
+        "s3://us-east-1-ucx-container/database1/",
+    ]
+
+
+@pytest.mark.parametrize(
+    "location,expected",
+    [
+        ("s3://bucket/db/table", ["s3://bucket/db/"]),
+        ("S3://bucket/db/table", ["S3://bucket/db/"]),
+        (
+            "abfss://container@account.dfs.core.windows.net/db/table",
+            ["abfss://container@account.dfs.core.windows.net/db/"],
+        ),
+        ("hdfs://namenode-1/warehouse/db/table", ["hdfs://namenode-1/warehouse/db/"]),
+        ("r2://bucket/db/table", ["r2://bucket/db/"]),
+        ("oss://bucket/db/table", ["oss://bucket/db/"]),
+        ("dbfs:/user/hive/warehouse/db/table", []),
+        ("/warehouse/db/table", []),
+        ("c:/db/table", []),
+        ("averylongscheme://bucket/db/table", []),
+    ],
+)
+def test_external_locations_schemes(location, expected):
+    crawler = ExternalLocationCrawler(Mock(), MockBackend(), "test")
+    row_factory = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    result_set = crawler._external_locations([row_factory([location, ""])], [])
+    assert [r.location for r in result_set] == expected
+
+
+def test_external_locations_repeated_slashes():
+    crawler = ExternalLocationCrawler(Mock(), MockBackend(), "test")
+    row_factory = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    sample_locations = [
+        row_factory(["s3://bucket/db//table", ""]),
+        row_factory(["hdfs://namenode//warehouse/db1/table", ""]),
+        row_factory(["hdfs://namenode///warehouse/db2//table", ""]),
+    ]
+    result_set = crawler._external_locations(sample_locations, [])
+    assert [r.location for r in result_set] == ["hdfs://namenode/warehouse/", "s3://bucket/db/"]
+
+
+def test_external_locations_warns_on_unclassified(caplog):
+    crawler = ExternalLocationCrawler(Mock(), MockBackend(), "test")
+    row_factory = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    sample_locations = [
+        row_factory(["/warehouse/db/table", ""]),
+        row_factory(["/warehouse/db/table", ""]),
+        row_factory(["dbfs:/user/hive/warehouse/db/table", ""]),
+    ]
+    with caplog.at_level("WARNING", logger="databricks.labs.ucx.hive_metastore.data_objects"):
+        assert crawler._external_locations(sample_locations, []) == []
+    assert [r.message for r in caplog.records] == [
+        "Skipping table location without a storage scheme: /warehouse/db/table"
+    ]
+
+
+def test_external_locations_dedupes_jdbc():
+    crawler = ExternalLocationCrawler(Mock(), MockBackend(), "test")
+    row_factory = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    storage_properties = "[database=test_db, host=somemysql.us-east-1.rds.amazonaws.com, port=3306, dbtable=movies]"
+    sample_locations = [
+        row_factory(["jdbc:/MYSQL", storage_properties]),
+        row_factory(["jdbc:/MYSQL", storage_properties.replace("movies", "actors")]),
+    ]
+    result_set = crawler._external_locations(sample_locations, [])
+    assert [r.location for r in result_set] == ["jdbc:mysql://somemysql.us-east-1.rds.amazonaws.com:3306/test_db"]
+
+
+def test_external_locations_snapshot():
+    table_row = type("Row", (Row,), {"__columns__": ["location", "storage_properties"]})
+    mount_row = type("Row", (Row,), {"__columns__": ["name", "source"]})
+    backend = MockBackend(
+        rows={
+            "SELECT location, storage_properties FROM test.tables": [
+                table_row(["s3://bucket/db/table1", ""]),
+                table_row(["s3://bucket/db/table2", ""]),
+                table_row(["dbfs:/mnt/ucx/db/table3", ""]),
+            ],
+            "SELECT \\* FROM test.mounts": [mount_row(["/mnt/ucx", "abfss://container@account.dfs.core.windows.net"])],
+        }
+    )
+    crawler = ExternalLocationCrawler(Mock(), backend, "test")
+    result_set = crawler.snapshot()
+    assert [r.location for r in result_set] == [
+        "abfss://container@account.dfs.core.windows.net/db/",
+        "s3://bucket/db/",
+    ]
+    assert result_set == backend.rows_written_for("hive_metastore.test.external_locations", "append")
+
+
+def test_external_locations_snapshot_reuses_inventory():
+    location_row = type("Row", (Row,), {"__columns__": ["location"]})
+    backend = MockBackend(rows={"SELECT location FROM test.external_locations": [location_row(["s3://bucket/db/"])]})
+    crawler = ExternalLocationCrawler(Mock(), backend, "test")
+    result_set = crawler.snapshot()
+    assert [r.location for r in result_set] == ["s3://bucket/db/"]
+    assert not any("test.tables" in query for query in backend.queries)
+    assert backend.rows_written_for("hive_metastore.test.external_locations", "append") == []
+
+
 def test_job_assessment():
     sample_jobs = [
         BaseJob(
@@ -2853,3 +2968,29 @@ def test_init_script_without_config_should_have_empty_creator_name(mocker):
             script_id="222", script_name="newscript", enabled=False, created_by=None, success=1, failures="[]"
         ),
     ]
+
+
+def _spn_listing_ws():
+    ws = Mock()
+    ws.clusters.list.return_value = []
+    ws.pipelines.list_pipelines.return_value = []
+    ws.jobs.list.return_value = []
+    ws.warehouses.get_workspace_warehouse_config().data_access_config = []
+    return ws
+
+
+def test_azure_spn_crawl_keeps_error_type_when_one_listing_fails():
+    ws = _spn_listing_ws()
+    ws.pipelines.list_pipelines.side_effect = InternalError(...)
+
+    with pytest.raises(InternalError):
+        AzureServicePrincipalCrawler(ws, MockBackend(), "ucx")._crawl()
+
+
+def test_azure_spn_crawl_raises_many_error_when_several_listings_fail():
+    ws = _spn_listing_ws()
+    ws.pipelines.list_pipelines.side_effect = InternalError(...)
+    ws.jobs.list.side_effect = NotFound(...)
+
+    with pytest.raises(ManyError):
+        AzureServicePrincipalCrawler(ws, MockBackend(), "ucx")._crawl()
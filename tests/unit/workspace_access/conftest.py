@@ -1,9 +1,11 @@
+# `migration_state` is session-scoped, so every module in a worker shares one instance. Tests and the code under
+# test only read it, so these tests stay safe to distribute with `pytest -n auto` (see `hatch run test`).
 import pytest
 
 from databricks.labs.ucx.workspace_access.groups import MigratedGroup, MigrationState
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def migration_state() -> MigrationState:
     grp = [
         MigratedGroup(
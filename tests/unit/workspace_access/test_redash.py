@@ -1,6 +1,7 @@
 import json
 from datetime import timedelta
-from unittest.mock import MagicMock
+from types import SimpleNamespace
+from unittest.mock import Mock
 
 import pytest
 from databricks.sdk.core import DatabricksError
@@ -13,10 +14,107 @@ from databricks.labs.ucx.workspace_access.redash import (
     RedashPermissionsSupport,
 )
 
+ACL_TEST_MANAGE = sql.AccessControl(group_name="test", permission_level=sql.PermissionLevel.CAN_MANAGE)
+ACL_IRRELEVANT_MANAGE = sql.AccessControl(group_name="irrelevant", permission_level=sql.PermissionLevel.CAN_MANAGE)
+ACL_G1_MANAGE = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE)
+ACL_G1_RUN = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN)
+ACL_G2_MANAGE = sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_MANAGE)
+ACL_G2_RUN = sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_RUN)
 
-def test_crawlers():
-    ws = MagicMock()
+_CRAWL_RESPONSES = tuple(
+    sql.GetResponse(object_type=ot, object_id="test", access_control_list=[ACL_TEST_MANAGE])
+    for ot in (sql.ObjectType.ALERT, sql.ObjectType.QUERY, sql.ObjectType.DASHBOARD)
+)
+_RESP_A_TEST_IRRELEVANT_MANAGE = sql.GetResponse(
+    object_type=sql.ObjectType.ALERT, object_id="test", access_control_list=[ACL_TEST_MANAGE, ACL_IRRELEVANT_MANAGE]
+)
+_APPLY_RAW = json.dumps(_RESP_A_TEST_IRRELEVANT_MANAGE.as_dict())
+_RESP_Q_G1G2_MANAGE = sql.GetResponse(
+    object_type=sql.ObjectType.QUERY, object_id="test", access_control_list=[ACL_G1_MANAGE, ACL_G2_MANAGE]
+)
+_RESP_Q_G1_MANAGE_RUN_G2_MANAGE = sql.GetResponse(
+    object_type=sql.ObjectType.QUERY,
+    object_id="test",
+    access_control_list=[ACL_G1_MANAGE, ACL_G1_RUN, ACL_G1_RUN, ACL_G2_MANAGE],
+)
+_RESP_Q_G1_MANAGE_G2_RUN = sql.GetResponse(
+    object_type=sql.ObjectType.QUERY, object_id="test", access_control_list=[ACL_G1_MANAGE, ACL_G2_RUN]
+)
+
+
+class _FakeClock:
+    """Replaces the time module seen by databricks.sdk.retries, so that backoff sleeps advance the clock
+    instead of blocking the test."""
+
+    def __init__(self):
+        self._now = 0.0
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        self._now += seconds
+
+
+def _responding(outcome):
+    def call(*_, **__):
+        if isinstance(outcome, type) and issubclass(outcome, Exception):
+            # a fresh instance per raise, so tracebacks don't pile up on a shared exception object
+            raise outcome(...)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call
+
+
+def _stub_ws(get_response=None, set_response=None):
+    """Workspace client stub for tests that don't assert on calls: it skips Mock's call recording, which adds up in
+    the retry loops of _applier_task. Tests get it through the `make_sup` fixture.
+    Unless given, `set` echoes the `get` response back, as the permissions API returns the resulting ACL."""
+    if set_response is None:
+        set_response = get_response
+    return SimpleNamespace(
+        dbsql_permissions=SimpleNamespace(get=_responding(get_response), set=_responding(set_response))
+    )
+
+
+def _make_listings(ws):
+    return [
+        Listing(ws.alerts.list, sql.ObjectTypePlural.ALERTS),
+        Listing(ws.dashboards.list, sql.ObjectTypePlural.DASHBOARDS),
+        Listing(ws.queries.list, sql.ObjectTypePlural.QUERIES),
+    ]
+
+
+@pytest.fixture
+def ws():
+    return Mock()
 
+
+@pytest.fixture
+def sup(ws):
+    return RedashPermissionsSupport(ws=ws, listings=[])
+
+
+@pytest.fixture
+def make_sup():
+    """Builds a support object over a `_stub_ws` with the given responses, verifying with a 10ms timeout."""
+
+    def inner(**responses):
+        return RedashPermissionsSupport(
+            ws=_stub_ws(**responses), listings=[], verify_timeout=timedelta(milliseconds=10)
+        )
+
+    return inner
+
+
+@pytest.fixture
+def fake_clock(mocker):
+    return mocker.patch("databricks.sdk.retries.time", _FakeClock())
+
+
+def test_crawlers(ws):
     ws.alerts.list.return_value = [
         sql.Alert(
             id="test",
@@ -29,26 +127,9 @@ def test_crawlers():
     ]
     ws.dashboards.list.return_value = [sql.Dashboard(id="test")]
 
-    sample_acl = [
-        sql.AccessControl(
-            group_name="test",
-            permission_level=sql.PermissionLevel.CAN_MANAGE,
-        )
-    ]
+    ws.dbsql_permissions.get.side_effect = list(_CRAWL_RESPONSES)
 
-    ws.dbsql_permissions.get.side_effect = [
-        sql.GetResponse(object_type=ot, object_id="test", access_control_list=sample_acl)
-        for ot in [sql.ObjectType.ALERT, sql.ObjectType.QUERY, sql.ObjectType.DASHBOARD]
-    ]
-
-    sup = RedashPermissionsSupport(
-        ws=ws,
-        listings=[
-            Listing(ws.alerts.list, sql.ObjectTypePlural.ALERTS),
-            Listing(ws.dashboards.list, sql.ObjectTypePlural.DASHBOARDS),
-            Listing(ws.queries.list, sql.ObjectTypePlural.QUERIES),
-        ],
-    )
+    sup = RedashPermissionsSupport(ws=ws, listings=_make_listings(ws))
 
     tasks = list(sup.get_crawler_tasks())
     assert len(tasks) == 3
@@ -62,234 +143,78 @@ def test_crawlers():
         assert item.raw is not None
 
 
-def test_apply(migration_state):
-    ws = MagicMock()
-    ws.dbsql_permissions.get.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.ALERT,
-        object_id="test",
-        access_control_list=[
-            sql.AccessControl(
-                group_name="test",
-                permission_level=sql.PermissionLevel.CAN_MANAGE,
-            ),
-            sql.AccessControl(
-                group_name="irrelevant",
-                permission_level=sql.PermissionLevel.CAN_MANAGE,
-            ),
-        ],
-    )
-    ws.dbsql_permissions.set.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.ALERT,
-        object_id="test",
-        access_control_list=[
-            sql.AccessControl(
-                group_name="test",
-                permission_level=sql.PermissionLevel.CAN_MANAGE,
-            ),
-            sql.AccessControl(
-                group_name="irrelevant",
-                permission_level=sql.PermissionLevel.CAN_MANAGE,
-            ),
-        ],
-    )
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
-    item = Permissions(
-        object_id="test",
-        object_type="alerts",
-        raw=json.dumps(
-            sql.GetResponse(
-                object_type=sql.ObjectType.ALERT,
-                object_id="test",
-                access_control_list=[
-                    sql.AccessControl(
-                        group_name="test",
-                        permission_level=sql.PermissionLevel.CAN_MANAGE,
-                    ),
-                    sql.AccessControl(
-                        group_name="irrelevant",
-                        permission_level=sql.PermissionLevel.CAN_MANAGE,
-                    ),
-                ],
-            ).as_dict()
-        ),
-    )
+def test_apply(ws, sup, migration_state):
+    ws.dbsql_permissions.get.return_value = _RESP_A_TEST_IRRELEVANT_MANAGE
+    ws.dbsql_permissions.set.return_value = _RESP_A_TEST_IRRELEVANT_MANAGE
+    item = Permissions(object_id="test", object_type="alerts", raw=_APPLY_RAW)
     task = sup.get_apply_task(item, migration_state)
     task()
     assert ws.dbsql_permissions.set.call_count == 1
-    expected_payload = [
-        sql.AccessControl(
-            group_name="test",
-            permission_level=sql.PermissionLevel.CAN_MANAGE,
-        ),
-        sql.AccessControl(
-            group_name="irrelevant",
-            permission_level=sql.PermissionLevel.CAN_MANAGE,
-        ),
-    ]
     ws.dbsql_permissions.set.assert_called_once_with(
-        object_type=sql.ObjectTypePlural.ALERTS, object_id="test", access_control_list=expected_payload
+        object_type=sql.ObjectTypePlural.ALERTS,
+        object_id="test",
+        access_control_list=[ACL_TEST_MANAGE, ACL_IRRELEVANT_MANAGE],
     )
 
 
-def test_safe_getter_known():
-    ws = MagicMock()
-    ws.dbsql_permissions.get.side_effect = NotFound(...)
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
+def test_safe_getter_known(make_sup):
+    sup = make_sup(get_response=NotFound)
     assert sup._safe_get_dbsql_permissions(object_type=sql.ObjectTypePlural.ALERTS, object_id="test") is None
 
 
-def test_safe_getter_unknown():
-    ws = MagicMock()
-    ws.dbsql_permissions.get.side_effect = InternalError(...)
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
+def test_safe_getter_unknown(make_sup):
+    sup = make_sup(get_response=InternalError)
     with pytest.raises(DatabricksError):
         sup._safe_get_dbsql_permissions(object_type=sql.ObjectTypePlural.ALERTS, object_id="test")
 
 
-def test_empty_permissions():
-    ws = MagicMock()
-    ws.dbsql_permissions.get.side_effect = NotFound(...)
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
+def test_empty_permissions(make_sup):
+    sup = make_sup(get_response=NotFound)
     assert sup._crawler_task(object_id="test", object_type=sql.ObjectTypePlural.ALERTS) is None
 
 
-def test_applier_task_should_return_true_if_permission_is_up_to_date():
-    ws = MagicMock()
-    acl_grp_1 = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE)
-    acl_grp_2 = sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_MANAGE)
-    ws.dbsql_permissions.get.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[acl_grp_1, acl_grp_2],
-    )
-    ws.dbsql_permissions.set.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[acl_grp_1, acl_grp_2],
-    )
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
-    result = sup._applier_task(sql.ObjectTypePlural.QUERIES, "test", [acl_grp_1])
+def test_applier_task_should_return_true_if_permission_is_up_to_date(make_sup):
+    sup = make_sup(get_response=_RESP_Q_G1G2_MANAGE)
+    result = sup._applier_task(sql.ObjectTypePlural.QUERIES, "test", [ACL_G1_MANAGE])
     assert result
 
 
-def test_applier_task_should_return_true_if_permission_is_up_to_date_with_multiple_permissions():
-    ws = MagicMock()
-    acl_1_grp_1 = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE)
-    acl_2_grp_1 = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN)
-    acl_3_grp_1 = sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN)
-    acl_grp_2 = sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_MANAGE)
-    ws.dbsql_permissions.get.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[acl_1_grp_1, acl_2_grp_1, acl_3_grp_1, acl_grp_2],
-    )
-    ws.dbsql_permissions.set.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[acl_1_grp_1, acl_2_grp_1, acl_3_grp_1, acl_grp_2],
-    )
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[])
-    result = sup._applier_task(sql.ObjectTypePlural.QUERIES, "test", [acl_1_grp_1, acl_2_grp_1])
+def test_applier_task_should_return_true_if_permission_is_up_to_date_with_multiple_permissions(make_sup):
+    sup = make_sup(get_response=_RESP_Q_G1_MANAGE_RUN_G2_MANAGE)
+    result = sup._applier_task(sql.ObjectTypePlural.QUERIES, "test", [ACL_G1_MANAGE, ACL_G1_RUN])
     assert result
 
 
-def test_applier_task_failed():
-    ws = MagicMock()
-    ws.dbsql_permissions.get.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[
-            sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE),
-            sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_RUN),
-        ],
-    )
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
-    with pytest.raises(TimeoutError) as e:
-        sup._applier_task(
-            sql.ObjectTypePlural.QUERIES,
-            "test",
-            [sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN)],
-        )
-    assert "Timed out after" in str(e.value)
-
-
-def test_applier_task_failed_when_all_permissions_not_up_to_date():
-    ws = MagicMock()
-    ws.dbsql_permissions.get.return_value = sql.GetResponse(
-        object_type=sql.ObjectType.QUERY,
-        object_id="test",
-        access_control_list=[
-            sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE),
-            sql.AccessControl(group_name="group_2", permission_level=sql.PermissionLevel.CAN_RUN),
-        ],
-    )
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
-    with pytest.raises(TimeoutError) as e:
-        sup._applier_task(
-            sql.ObjectTypePlural.QUERIES,
-            "test",
-            [
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN),
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE),
-            ],
-        )
-    assert "Timed out after" in str(e.value)
-
-
-def test_applier_task_when_set_error_non_retriable():
-    ws = MagicMock()
-    error_code = "PERMISSION_DENIED"
-    ws.dbsql_permissions.set.side_effect = DatabricksError(error_code=error_code)
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
-    with pytest.raises(TimeoutError) as e:
-        sup._applier_task(
-            sql.ObjectTypePlural.QUERIES,
-            "test",
-            [
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN),
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE),
-            ],
-        )
-    assert "Timed out after" in str(e.value)
-
-
-def test_applier_task_when_set_error_retriable():
-    ws = MagicMock()
-    error_code = "INTERNAL_SERVER_ERROR"
-    ws.dbsql_permissions.set.side_effect = DatabricksError(error_code=error_code)
-
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
+@pytest.mark.parametrize(
+    "set_response,acl",
+    [
+        pytest.param(None, [ACL_G1_RUN], id="not-applied"),
+        pytest.param(None, [ACL_G1_RUN, ACL_G1_MANAGE], id="not-all-applied"),
+        pytest.param(
+            DatabricksError(error_code="PERMISSION_DENIED"), [ACL_G1_RUN, ACL_G1_MANAGE], id="set-error-non-retriable"
+        ),
+        pytest.param(
+            DatabricksError(error_code="INTERNAL_SERVER_ERROR"), [ACL_G1_RUN, ACL_G1_MANAGE], id="set-error-retriable"
+        ),
+    ],
+)
+def test_applier_task_timeout(make_sup, fake_clock, set_response, acl):
+    sup = make_sup(get_response=_RESP_Q_G1_MANAGE_G2_RUN, set_response=set_response)
     with pytest.raises(TimeoutError) as e:
-        sup._applier_task(
-            sql.ObjectTypePlural.QUERIES,
-            "test",
-            [
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_RUN),
-                sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE),
-            ],
-        )
+        sup._applier_task(sql.ObjectTypePlural.QUERIES, "test", acl)
     assert "Timed out after" in str(e.value)
 
 
-def test_safe_set_permissions_when_error_non_retriable():
-    ws = MagicMock()
-    ws.dbsql_permissions.set.side_effect = PermissionDenied(...)
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
-    acl = [sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE)]
+def test_safe_set_permissions_when_error_non_retriable(make_sup):
+    sup = make_sup(set_response=PermissionDenied)
+    acl = [ACL_G1_MANAGE]
     result = sup._safe_set_permissions(sql.ObjectTypePlural.QUERIES, "test", acl)
     assert result is None
 
 
-def test_safe_set_permissions_when_error_retriable():
-    ws = MagicMock()
-    ws.dbsql_permissions.set.side_effect = InternalError(...)
-    sup = RedashPermissionsSupport(ws=ws, listings=[], verify_timeout=timedelta(seconds=1))
-    acl = [sql.AccessControl(group_name="group_1", permission_level=sql.PermissionLevel.CAN_MANAGE)]
+def test_safe_set_permissions_when_error_retriable(make_sup):
+    sup = make_sup(set_response=InternalError)
+    acl = [ACL_G1_MANAGE]
     with pytest.raises(InternalError) as e:
         sup._safe_set_permissions(sql.ObjectTypePlural.QUERIES, "test", acl)
     assert e.type == InternalError